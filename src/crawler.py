@@ -1,47 +1,275 @@
 import asyncio
 import aiohttp
-import json
+import orjson
 import csv
+import itertools
 from pathlib import Path
-from bs4 import BeautifulSoup
-from utils import load_config, load_checkpoint, save_checkpoint
+from lxml import html as lxml_html
+from utils import load_config, load_checkpoint, save_checkpoint, iter_done_ids, append_checkpoint
 import logging
 import time
 import random
+import re
+import math
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from array import array
+from bisect import bisect_left
+from collections import deque
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Language": "en-US,en;q=0.9,vi;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache"
+}
+
+_WS = re.compile(r"\s+")
+
+# Field order of the tuples returned by fetch_product and of the result columns
+PRODUCT_FIELDS = ("id", "name", "url_key", "price", "description", "images")
+
+# Minimum seconds between progress line updates
+PROGRESS_INTERVAL = 0.1
+
+# Descriptions shorter than this are parsed inline, the IPC round trip would cost more
+INLINE_DESCRIPTION_LIMIT = 2048
+
+def jittered_backoff(attempt: int, base: float, cap: float) -> float:
+    # Exponential backoff with +-50% jitter so retrying workers don't fire in lockstep
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+def _iter_batches(path: Path, size: int):
+    # Yield the id column one batch at a time instead of loading the whole CSV
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        id_index = header.index("id")
+        # Skip blank lines like csv.DictReader did, so batch boundaries stay the same
+        rows = (row for row in reader if row)
+        while chunk := list(itertools.islice(rows, size)):
+            yield [row[id_index] for row in chunk]
+
+def _write_batch_file(path: Path, columns):
+    # One product per line inside the JSON array, no intermediate list of dicts
+    blob = b"[\n" + b",\n".join(
+        orjson.dumps(dict(zip(PRODUCT_FIELDS, row)), option=orjson.OPT_NON_STR_KEYS)
+        for row in zip(*columns)
+    ) + b"\n]\n"
+    path.write_bytes(blob)
+
+def _make_description_pool() -> ProcessPoolExecutor:
+    # Pool workers start lazily, after aiohttp and to_thread have started threads, and forking
+    # a multi-threaded process can deadlock. Use forkserver where the platform has it (not Windows).
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("forkserver"))
+    return ProcessPoolExecutor(max_workers=os.cpu_count())
+
+def _clean_description_worker(html_text: str) -> str:
+    # Module-level so it can be pickled into the process pool
+    if not html_text or not isinstance(html_text, str):
+        return ""
+    try:
+        # Join text nodes with a space so adjacent block elements don't run together
+        text = " ".join(lxml_html.fromstring(html_text).itertext())
+    except Exception:
+        # Empty or unparseable markup (e.g. whitespace only)
+        return ""
+    return _WS.sub(" ", text).strip()
+
+class DoneIdSet:
+    # Exact set of completed product ids. Numeric ids live in a sorted int64 array
+    # (8 bytes each instead of ~100 for a str in a set), ids added during the run
+    # sit in a small set until compact() merges them in after each batch.
+    LOAD_CHUNK = 65536
+
+    def __init__(self, ids=()):
+        self._other = set()  # ids that don't fit the array, kept as strings
+        self._recent = set()
+        # Sort the ids in bounded chunks and merge them straight into the array,
+        # so loading never holds every id as a Python object at once
+        runs = []
+        ids = iter(ids)
+        while chunk := list(itertools.islice(ids, self.LOAD_CHUNK)):
+            runs.append(array("q", sorted(self._split_ints(chunk))))
+        self._sorted = array("q", self._unique(heapq.merge(*runs)))
+
+    @staticmethod
+    def _as_int(pid: str):
+        # Only canonical decimal ids, so "007" and "7" stay distinct like in a str set
+        if pid.isascii() and pid.isdigit() and len(pid) < 19 and (pid[0] != "0" or pid == "0"):
+            return int(pid)
+        return None
+
+    def _split_ints(self, ids):
+        # Yield the ids that fit the array as ints, keep the rest in _other
+        for pid in ids:
+            n = self._as_int(pid)
+            if n is None:
+                self._other.add(pid)
+            else:
+                yield n
+
+    @staticmethod
+    def _unique(sorted_ints):
+        previous = None
+        for n in sorted_ints:
+            if n != previous:
+                yield n
+                previous = n
+
+    def __contains__(self, pid: str) -> bool:
+        if pid in self._recent:
+            return True
+        n = self._as_int(pid)
+        if n is None:
+            return pid in self._other
+        i = bisect_left(self._sorted, n)
+        return i < len(self._sorted) and self._sorted[i] == n
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._other) + len(self._recent)
+
+    def add(self, pid: str):
+        if pid not in self:
+            self._recent.add(pid)
+
+    def update(self, ids):
+        for pid in ids:
+            self.add(pid)
+
+    def compact(self):
+        if not self._recent:
+            return
+        # Only the new ids are sorted, then merged into the existing array
+        new_ints = sorted(self._split_ints(self._recent))
+        self._sorted = array("q", heapq.merge(self._sorted, new_ints))
+        self._recent.clear()
 
 class RateLimiter:
-    def __init__(self):
-        self.request_times = []
-        self.success_rate = 1.0
-        self.rate_limit_count = 0
-        self.last_rate_limit_time = 0
-    
-    async def get_delay(self):
-        if self.rate_limit_count > 0:
-            base_delay = 2 ** self.rate_limit_count
-            return min(base_delay, 60)  # Max 60s
-        return 0.1  # Min delay
-    
+    MAX_DELAY = 60  # Max 60s
+
+    def get_delay(self, attempt: int, retry_after: str | None = None) -> float:
+        # Honor the server's Retry-After when it sends one, else back off with jitter
+        delay = self._parse_retry_after(retry_after) if retry_after else None
+        if delay is None:
+            return jittered_backoff(attempt, 0.5, self.MAX_DELAY)
+        return min(delay, self.MAX_DELAY)
+
+    @staticmethod
+    def _parse_retry_after(value: str):
+        # Retry-After is either delta-seconds or an HTTP-date
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        # The header is server controlled: nan/inf would make asyncio.sleep never return
+        if not math.isfinite(seconds):
+            return None
+        return max(seconds, 0.0)
+
+class ConcurrencyController:
+    # AIMD cap on in-flight requests: halve on 429, grow by one after a streak of successes
+    def __init__(self, max_cap: int, success_window: int = 50, decrease_interval: float = 1.0):
+        self.max_cap = max_cap
+        self.cap = max_cap
+        self.inflight = 0
+        self.success_window = success_window
+        self.success_streak = 0
+        # A burst of 429s from requests already in flight is one congestion event, cut once per interval
+        self.decrease_interval = decrease_interval
+        self._last_decrease = float("-inf")
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.inflight < self.cap)
+            self.inflight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self.inflight -= 1
+            # One slot freed, one waiter can take it
+            self._cond.notify()
+
+    async def record_success(self):
+        self.success_streak += 1
+        if self.success_streak >= self.success_window:
+            self.success_streak = 0
+            if self.cap < self.max_cap:
+                self.cap += 1
+                # The new slot is open right away, let blocked requests re-check
+                async with self._cond:
+                    self._cond.notify_all()
+
     def record_rate_limit(self):
-        self.rate_limit_count += 1
-        self.last_rate_limit_time = time.time()
-    
-    def record_success(self):
-        if self.rate_limit_count > 0:
-            self.rate_limit_count = max(0, self.rate_limit_count - 1)
-
-class RequestSpacer:
-    def __init__(self, min_interval=0.2):
-        self.min_interval = min_interval
-        self.last_request_time = 0
-    
-    async def wait_if_needed(self):
-        now = time.time()
-        time_since_last = now - self.last_request_time
-        if time_since_last < self.min_interval:
-            wait_time = self.min_interval - time_since_last
-            await asyncio.sleep(wait_time)
-        self.last_request_time = time.time()
+        self.success_streak = 0
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_interval:
+            return
+        self._last_decrease = now
+        self.cap = max(1, self.cap // 2)
+
+class TokenBucket:
+    # Request rate limiter whose refill rate adapts to the share of 429s seen in the last minute
+    def __init__(self, rate: float, capacity: float, window: float = 60.0, adjust_interval: float = 5.0):
+        self.max_rate = rate
+        self.min_rate = 1.0
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.window = window
+        self.adjust_interval = adjust_interval
+        self.outcomes = deque()  # (timestamp, was_rate_limited)
+        self.last_refill = time.monotonic()
+        self.last_adjust = self.last_refill
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def _adjust_rate(self, now: float):
+        while self.outcomes and now - self.outcomes[0][0] > self.window:
+            self.outcomes.popleft()
+        total = len(self.outcomes)
+        limited = sum(1 for _, was_limited in self.outcomes if was_limited)
+        if limited:
+            self.rate = max(self.min_rate, self.rate * (1 - 0.5 * (limited / total)))
+        elif total:
+            self.rate = min(self.max_rate, self.rate * 1.05)
+        self.last_adjust = now
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def record(self, rate_limited: bool):
+        now = time.monotonic()
+        self.outcomes.append((now, rate_limited))
+        if now - self.last_adjust >= self.adjust_interval:
+            self._refill(now)
+            self._adjust_rate(now)
 
 class UserAgentRotator:
     def __init__(self):
@@ -63,36 +291,62 @@ class TikiCrawler:
     def __init__(self, config_path: Path):
         self.config = load_config(config_path)
         self.api_url = self.config["api_url"]
+        # Split the URL template once so fetch_product only has to concatenate
+        self._url_prefix, self._url_suffix = self.api_url.split("{id}", 1)
         self.concurrency = min(self.config["concurrency"], 50)
         self.timeout = aiohttp.ClientTimeout(total=self.config["timeout"])
         self.retry = self.config["retry"]
-        self.backoff_seconds = self.config.get("backoff_seconds", [5, 10])
+        # Statuses worth retrying vs. ones that are final on the first response
+        self._retryable = {429, 500, 502, 503, 504}
+        self._nonretryable_fail = {404}
         self.batch_size = self.config["batch_size"]
+        self._connector_kwargs = {
+            "limit": self.concurrency,
+            "limit_per_host": self.concurrency,
+            "ttl_dns_cache": 300,
+            "enable_cleanup_closed": True
+        }
 
         self.rate_limiter = RateLimiter()
-        self.request_spacer = RequestSpacer(min_interval=0.3)  
+        self.concurrency_controller = ConcurrencyController(self.concurrency)
+        self.token_bucket = TokenBucket(rate=self.concurrency / 1.0, capacity=self.concurrency)
         self.ua_rotator = UserAgentRotator()
+        # Description parsing pool, only alive for the duration of run()
+        self._pool = None
 
         self.checkpoint_path = Path("logs/checkpoint.json")
+        self.done_ids_path = Path("logs/checkpoint_ids.ndjson")
         # Load checkpoint if exists, otherwise start fresh
+        self.done_ids = DoneIdSet(iter_done_ids(self.done_ids_path))
         if self.checkpoint_path.exists():
             checkpoint_data = load_checkpoint(self.checkpoint_path)
             if isinstance(checkpoint_data, dict):
                 # New checkpoint format with batch progress
-                self.done_ids = set(checkpoint_data.get("done_ids", []))
+                legacy_ids = set(checkpoint_data.get("done_ids", []))
                 self.last_completed_batch = checkpoint_data.get("last_completed_batch", 0)
-                print(f"Resuming from checkpoint - Batch {self.last_completed_batch} completed, {len(self.done_ids)} products processed")
             else:
                 # Old checkpoint format (backward compatibility)
-                self.done_ids = set(checkpoint_data)
+                legacy_ids = checkpoint_data
                 self.last_completed_batch = 0
-                print(f"Resuming from old checkpoint - {len(self.done_ids)} products processed")
+            # Move ids from the old JSON checkpoint into the append-only log
+            missing_ids = sorted(pid for pid in legacy_ids if pid not in self.done_ids)
+            append_checkpoint(self.done_ids_path, missing_ids)
+            self.done_ids.update(missing_ids)
+            self.done_ids.compact()
+            print(f"Resuming from checkpoint - Batch {self.last_completed_batch} completed, {len(self.done_ids)} products processed")
+        elif self.done_ids:
+            self.last_completed_batch = 0
+            print(f"Resuming from checkpoint - {len(self.done_ids)} products processed")
         else:
-            self.done_ids = set()
             self.last_completed_batch = 0
             print("No checkpoint found - Starting fresh from beginning!")
-        self.results = []
-        self.error_count = {"http_error": 0, "network_error": 0, "not_found": 0, "rate_limit": 0}
+        # IDs finished since the last checkpoint flush
+        self._batch_new_ids = []
+        # Finished batches waiting for the writer task started in run()
+        self._write_queue = asyncio.Queue()
+        # Column buffers (one list per field), rows are assembled only when written
+        self.results = tuple([] for _ in PRODUCT_FIELDS)
+        self.error_count = {"http_error": 0, "network_error": 0, "not_found": 0, "rate_limit": 0, "parse_error": 0}
         self.total_processed = 0
         self.total_success = 0
         self.batch_processed = 0
@@ -103,87 +357,112 @@ class TikiCrawler:
             format="%(asctime)s [%(levelname)s] %(message)s"
         )
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        # One session for the whole run so the connection pool stays warm across batches
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(**self._connector_kwargs),
+            timeout=self.timeout,
+            headers=DEFAULT_HEADERS
+        )
+
     def clean_description(self, html_text: str) -> str:
-        if not html_text:
-            return ""
-        soup = BeautifulSoup(html_text, "lxml")
-        return soup.get_text(separator=" ", strip=True)
+        return _clean_description_worker(html_text)
 
-    async def fetch_product(self, session: aiohttp.ClientSession, product_id: str):
-        if product_id in self.done_ids:
-            return None
+    async def _parse_product(self, data: dict):
+        g = data.get  # bound once, looked up for every field below
+        html_text = g("description")
+        if self._pool is not None and isinstance(html_text, str) and len(html_text) >= INLINE_DESCRIPTION_LIMIT:
+            # Large descriptions are parsed in the process pool so the event loop keeps serving requests
+            loop = asyncio.get_running_loop()
+            try:
+                description = await loop.run_in_executor(self._pool, _clean_description_worker, html_text)
+            except BrokenProcessPool:
+                # A dead pool worker shouldn't abort the crawl, parse this one inline
+                logging.warning("Description process pool is broken - parsing inline")
+                description = self.clean_description(html_text)
+        else:
+            description = self.clean_description(html_text)
+        imgs = g("images")
+        return (
+            g("id"),
+            g("name"),
+            g("url_key"),
+            g("price"),
+            description,
+            # Only well-formed image objects carry a base_url, anything else in the list is skipped
+            tuple(img.get("base_url") for img in imgs if isinstance(img, dict)) if isinstance(imgs, list) else ()
+        )
 
-        # Wait for rate limiting
-        await self.request_spacer.wait_if_needed()
+    def _compute_backoff(self, resp: aiohttp.ClientResponse, attempt: int) -> float:
+        if resp.status == 429:
+            return self.rate_limiter.get_delay(attempt, resp.headers.get("Retry-After"))
+        return jittered_backoff(attempt, 0.25, 8)
 
-        url = self.api_url.format(id=product_id)
+    async def fetch_product(self, session: aiohttp.ClientSession, product_id: str):
+        url = self._url_prefix + product_id + self._url_suffix
         last_error_type = None  # Track the last error type for final counting
         
         for attempt in range(self.retry + 1):
             try:
-                # Rotate User-Agent and add more headers
-                headers = {
-                    "User-Agent": self.ua_rotator.get_next_ua(),
-                    "Accept": "application/json",
-                    "Accept-Language": "en-US,en;q=0.9,vi;q=0.8",
-                    "Accept-Encoding": "gzip, deflate, br",
-                    "Connection": "keep-alive",
-                    "Cache-Control": "no-cache",
-                    "Pragma": "no-cache"
-                }
+                # Rotate User-Agent, other headers come from the session defaults
+                headers = {"User-Agent": self.ua_rotator.get_next_ua()}
                 
-                async with session.get(url, timeout=self.timeout, headers=headers) as resp:
+                # Wait for rate limiting
+                await self.token_bucket.acquire()
+                async with self.concurrency_controller, session.get(url, timeout=self.timeout, headers=headers) as resp:
+                    self.token_bucket.record(resp.status == 429)
                     if resp.status == 200:
-                        data = await resp.json()
+                        data = orjson.loads(await resp.read())
+                        if not isinstance(data, dict):
+                            # Valid JSON that isn't a product object is as unusable as a malformed body
+                            raise ValueError(f"Unexpected product payload type: {type(data).__name__}")
                         self.total_success += 1
-                        self.rate_limiter.record_success()
-                        return {
-                            "id": data.get("id"),
-                            "name": data.get("name"),
-                            "url_key": data.get("url_key"),
-                            "price": data.get("price"),
-                            "description": self.clean_description(data.get("description")),
-                            "images": [img.get("base_url") for img in data.get("images", [])]
-                        }
-                    elif resp.status == 404:
+                        await self.concurrency_controller.record_success()
+                    elif resp.status in self._nonretryable_fail:
                         # 404 - no need to retry
                         self.error_count["not_found"] += 1
                         return None
-                    elif resp.status == 429:
-                        # 429 - rate limit, retry with backoff
-                        last_error_type = "rate_limit"
-                        self.rate_limiter.record_rate_limit()
+                    elif resp.status in self._retryable:
+                        # 429 / 5xx - transient, retry with backoff
+                        last_error_type = "rate_limit" if resp.status == 429 else "http_error"
+                        if resp.status == 429:
+                            self.concurrency_controller.record_rate_limit()
                         
                         if attempt < self.retry:
-                            #adaptive delay
-                            delay = await self.rate_limiter.get_delay()
-                            logging.warning(f"429 Too Many Requests - Attempt {attempt + 1}/{self.retry + 1} - Delay: {delay}s")
-                            await asyncio.sleep(delay)
+                            delay = self._compute_backoff(resp, attempt)
+                            logging.warning(f"HTTP {resp.status} - Attempt {attempt + 1}/{self.retry + 1} - Delay: {delay:.2f}s")
                         else:
-                            # When out of retry, set rate limit flag
-                            self.error_count["rate_limit"] += 1
+                            # When out of retry, count the last error type
+                            self.error_count[last_error_type] += 1
                             return None
                     else:
-                        # HTTP error - retry if attemps remain
-                        last_error_type = "http_error"
-                        if attempt < self.retry:
-                            await asyncio.sleep(1) 
-                        else:
-                            self.error_count["http_error"] += 1
-                            return None
+                        # Other HTTP errors won't fix themselves on retry
+                        self.error_count["http_error"] += 1
+                        return None
+                if resp.status == 200:
+                    # Build the product outside the response context so the connection is released first
+                    try:
+                        return await self._parse_product(data)
+                    except Exception:
+                        # One odd product must not cancel the whole batch
+                        logging.exception(f"Failed to parse product {product_id}")
+                        self.error_count["parse_error"] += 1
+                        return None
+                # Sleep after the response is released so the pooled connection isn't held
+                await asyncio.sleep(delay)
             except asyncio.TimeoutError:
                 # Timeout - retry if attemps remain
                 last_error_type = "network_error"
                 if attempt < self.retry:
-                    await asyncio.sleep(1)
+                    await asyncio.sleep(jittered_backoff(attempt, 0.25, 8))
                 else:
                     self.error_count["network_error"] += 1
                     return None
-            except aiohttp.ClientError:
-                # Network error - - retry if attemps remain
+            except (aiohttp.ClientError, ValueError):
+                # Network error or malformed body - retry if attemps remain
                 last_error_type = "network_error"
                 if attempt < self.retry:
-                    await asyncio.sleep(1)
+                    await asyncio.sleep(jittered_backoff(attempt, 0.25, 8))
                 else:
                     self.error_count["network_error"] += 1
                     return None
@@ -194,32 +473,40 @@ class TikiCrawler:
             
         return None
 
-    async def process_batch(self, ids_batch: list[str], batch_num: int):
+    async def process_batch(self, session: aiohttp.ClientSession, ids_batch: list[str], batch_num: int):
         batch_size = len(ids_batch)
         self.batch_processed = 0
         start_time = time.time()
         
         # Reset batch-specific counters
         batch_success = 0
-        batch_errors = {"http_error": 0, "network_error": 0, "not_found": 0, "rate_limit": 0}
+        batch_errors = {"http_error": 0, "network_error": 0, "not_found": 0, "rate_limit": 0, "parse_error": 0}
         
         # Store initial error counts to calculate batch-specific errors
         initial_errors = self.error_count.copy()
         
         print(f"\nBatch {batch_num:03d}/200 ({batch_size} san pham)")
         
-        async with aiohttp.ClientSession() as session:
-            sem = asyncio.Semaphore(self.concurrency)
-
-            async def bound_fetch(pid):
-                async with sem:
-                    return await self.fetch_product(session, pid)
+        # Skip IDs already crawled in a previous run before they reach a worker
+        pending = [pid for pid in ids_batch if pid not in self.done_ids]
+        if len(pending) < batch_size:
+            print(f"   Skipping {batch_size - len(pending)} san pham da crawl")
+        batch_size = len(pending)
+        
+        queue = asyncio.Queue()
+        for pid in pending:
+            queue.put_nowait(pid)
+        completed = 0
+        last_print = 0.0
 
-            tasks = [bound_fetch(pid) for pid in ids_batch]
-            completed = 0
-            
-            for coro in asyncio.as_completed(tasks):
-                result = await coro
+        async def worker():
+            nonlocal completed, batch_success, last_print
+            while True:
+                try:
+                    pid = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                result = await self.fetch_product(session, pid)
                 completed += 1
                 
                 # Calculate elapsed time
@@ -228,14 +515,25 @@ class TikiCrawler:
                 # Count results for this batch
                 if result:
                     batch_success += 1
-                    self.results.append(result)
-                    self.done_ids.add(str(result["id"]))
+                    for column, value in zip(self.results, result):
+                        column.append(value)
+                    done_id = str(result[0])
+                    if done_id not in self.done_ids:
+                        self.done_ids.add(done_id)
+                        self._batch_new_ids.append(done_id)
+                
+                # Throttle progress output to ~10 updates/s, always show the final count
+                now = time.monotonic()
+                if now - last_print < PROGRESS_INTERVAL and completed < batch_size:
+                    continue
+                last_print = now
                 
                 current_errors = self.error_count
                 batch_errors["not_found"] = current_errors["not_found"] - initial_errors["not_found"]
                 batch_errors["network_error"] = current_errors["network_error"] - initial_errors["network_error"]
                 batch_errors["rate_limit"] = current_errors["rate_limit"] - initial_errors["rate_limit"]
                 batch_errors["http_error"] = current_errors["http_error"] - initial_errors["http_error"]
+                batch_errors["parse_error"] = current_errors["parse_error"] - initial_errors["parse_error"]
                 
                 # Show real-time progress on same line (overwrite)
                 progress = (completed / batch_size) * 100
@@ -248,9 +546,17 @@ class TikiCrawler:
                     error_details.append(f"Rate Limit: {batch_errors['rate_limit']}")
                 if batch_errors["http_error"] > 0:
                     error_details.append(f"HTTP: {batch_errors['http_error']}")
+                if batch_errors["parse_error"] > 0:
+                    error_details.append(f"Parse: {batch_errors['parse_error']}")
                 
                 error_summary = ", ".join(error_details) if error_details else "No errors"
                 print(f"\r   Progress: {completed}/{batch_size} (Success: {batch_success}, {error_summary})", end="", flush=True)
+
+        # Fixed pool of workers, the ConcurrencyController's AIMD cap limits the in-flight requests.
+        # The TaskGroup waits for every worker and propagates the first failure.
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(min(self.concurrency, batch_size)):
+                tg.create_task(worker())
         
         print()
         
@@ -259,33 +565,31 @@ class TikiCrawler:
 
     def save_results(self, batch_num: int, batch_size: int):
         output_file = Path(f"output/products_{batch_num:03d}.json")
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(self.results, f, ensure_ascii=False, indent=2)
+        success_count = len(self.results[0])
         
         # Calculate success rate before clearing results
-        total_batch_results = len(self.results) + sum(self.error_count.values())
-        success_rate = (len(self.results) / total_batch_results) * 100 if total_batch_results > 0 else 0
-        
-        # Save results count BEFORE clearing
-        success_count = len(self.results)
+        total_batch_results = success_count + sum(self.error_count.values())
+        success_rate = (success_count / total_batch_results) * 100 if total_batch_results > 0 else 0
         
         # Display clean summary
         print(f"Da luu {success_count} san pham vao output/products_{batch_num:03d}.json")
         print(f"Batch {batch_num:03d} xong: {success_count}/{batch_size} thanh cong")
         
-        # Clear results and save checkpoint with batch progress
-        self.results.clear()
+        # Hand this batch's columns to the writer and start the next batch on fresh ones
+        columns = self.results
+        self.results = tuple([] for _ in PRODUCT_FIELDS)
         self.last_completed_batch = batch_num
         
-        # Save enhanced checkpoint with batch progress
+        new_ids = self._batch_new_ids
+        self._batch_new_ids = []
+        self.done_ids.compact()
         checkpoint_data = {
-            "done_ids": list(self.done_ids),
             "last_completed_batch": self.last_completed_batch,
             "total_success": self.total_success,
-            "error_count": self.error_count,
+            "error_count": dict(self.error_count),
             "timestamp": time.time()
         }
-        save_checkpoint(self.checkpoint_path, checkpoint_data)
+        self._write_queue.put_nowait((output_file, columns, new_ids, checkpoint_data))
         
         # Save detailed summary to log file
         summary = (
@@ -293,30 +597,52 @@ class TikiCrawler:
             f"Network Error: {self.error_count['network_error']}, "
             f"Not Found: {self.error_count['not_found']}, "
             f"Rate Limit: {self.error_count['rate_limit']}, "
+            f"Parse Error: {self.error_count['parse_error']}, "
             f"Success Rate: {success_rate:.2f}%"
         )
         with open("logs/error_report.txt", "a", encoding="utf-8") as ef:
             ef.write(summary + "\n")
 
-    async def run(self, input_csv: Path):
-        with open(input_csv, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            ids = [row["id"] for row in reader]
+    async def _writer(self):
+        # Batches are flushed in order, and a batch is only checkpointed once its output is on disk
+        while True:
+            item = await self._write_queue.get()
+            if item is None:
+                return
+            output_file, columns, new_ids, checkpoint_data = item
+            await asyncio.to_thread(_write_batch_file, output_file, columns)
+            # Record the batch as completed before logging its ids: a crash in between then only
+            # loses some done ids, instead of re-running the batch and overwriting its output
+            save_checkpoint(self.checkpoint_path, checkpoint_data)
+            append_checkpoint(self.done_ids_path, new_ids)
 
+    async def run(self, input_csv: Path):
         # Resume from next batch after last completed
         batch_num = self.last_completed_batch + 1
         print(f"Starting from batch {batch_num}")
         
-        for i in range(0, len(ids), self.batch_size):
-            current_batch_num = (i // self.batch_size) + 1
-            
-            # Skip completed batches
-            if current_batch_num <= self.last_completed_batch:
-                continue
-                
-            batch_ids = ids[i:i + self.batch_size]
-            batch_size = len(batch_ids)
-            
-            print(f"\n Processing batch {current_batch_num} (resuming from checkpoint)")
-            await self.process_batch(batch_ids, current_batch_num)
-            self.save_results(current_batch_num, batch_size)
+        self._pool = _make_description_pool()
+        # Encoding and writing finished batches runs alongside the crawl of the next one
+        writer_task = asyncio.create_task(self._writer())
+        try:
+            async with self._get_session() as session:
+                for current_batch_num, batch_ids in enumerate(_iter_batches(input_csv, self.batch_size), 1):
+                    # Skip completed batches
+                    if current_batch_num <= self.last_completed_batch:
+                        continue
+                    
+                    batch_size = len(batch_ids)
+                    
+                    print(f"\n Processing batch {current_batch_num} (resuming from checkpoint)")
+                    await self.process_batch(session, batch_ids, current_batch_num)
+                    self.save_results(current_batch_num, batch_size)
+                    if writer_task.done():
+                        # Surface a failed write now rather than after the whole crawl
+                        writer_task.result()
+        finally:
+            self._write_queue.put_nowait(None)
+            try:
+                await writer_task
+            finally:
+                self._pool.shutdown()
+                self._pool = None
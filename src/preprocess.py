@@ -1,8 +1,9 @@
-import pandas as pd
+import polars as pl
 from pathlib import Path
 
 def clean_csv(input_file: Path, output_file: Path):
-    df = pd.read_csv(input_file, dtype=str)
-    df = df.drop_duplicates(subset=["id"])
-    df.to_csv(output_file, index=False)
+    # Read every column as a string (infer_schema_length=0) and keep the first occurrence order
+    df = pl.read_csv(input_file, infer_schema_length=0)
+    df = df.unique(subset=["id"], maintain_order=True)
+    df.write_csv(output_file)
     print(f"[Preprocess] Input: {len(df)} unique IDs saved to {output_file}")
@@ -1,4 +1,6 @@
 import json
+import orjson
+import os
 from pathlib import Path
 
 def load_config(path: Path):
@@ -7,10 +9,33 @@ def load_config(path: Path):
 
 def load_checkpoint(path: Path):
     if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
-            return set(json.load(f))
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
+        # Batch progress is stored as a dict, old checkpoints are a plain list of ids
+        return data if isinstance(data, dict) else set(data)
     return set()
 
-def save_checkpoint(path: Path, done_ids: set):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(list(done_ids), f, ensure_ascii=False, indent=2)
+def save_checkpoint(path: Path, data):
+    if isinstance(data, set):
+        data = list(data)
+    # Write to a temp file and swap it in so a crash never leaves a half-written checkpoint
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp_path, path)
+
+def iter_done_ids(path: Path):
+    # Stream ids from the append-only log so callers can index them without a full str set
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+def append_checkpoint(path: Path, new_ids):
+    # Append-only log: one product id per line, only the ids finished since the last flush
+    if not new_ids:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(new_ids) + "\n")
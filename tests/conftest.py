@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The crawler modules import each other as top-level modules (python src/main.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,127 @@
+import asyncio
+
+import crawler
+from crawler import ConcurrencyController
+
+
+class FakeClock:
+    # Only patched into tests that never sleep, asyncio timers use time.monotonic too
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_of_429s_halves_cap_once(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(crawler.time, "monotonic", clock)
+    controller = ConcurrencyController(50, decrease_interval=1.0)
+
+    for _ in range(20):
+        controller.record_rate_limit()
+        clock.now += 0.01
+    assert controller.cap == 25
+
+    # The next congestion event, after the interval, cuts again
+    clock.now += 1.0
+    controller.record_rate_limit()
+    assert controller.cap == 12
+
+
+def test_cap_never_drops_below_one(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(crawler.time, "monotonic", clock)
+    controller = ConcurrencyController(4)
+    for _ in range(5):
+        controller.record_rate_limit()
+        clock.now += 2.0
+    assert controller.cap == 1
+
+
+def test_successes_grow_cap_up_to_max(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(crawler.time, "monotonic", clock)
+
+    async def main():
+        controller = ConcurrencyController(10, success_window=5)
+        controller.record_rate_limit()
+        assert controller.cap == 5
+
+        for _ in range(4):
+            await controller.record_success()
+        assert controller.cap == 5
+        await controller.record_success()
+        assert controller.cap == 6
+
+        for _ in range(5 * 20):
+            await controller.record_success()
+        assert controller.cap == 10
+
+    asyncio.run(main())
+
+
+def test_rate_limit_resets_success_streak(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(crawler.time, "monotonic", clock)
+
+    async def main():
+        controller = ConcurrencyController(10, success_window=5)
+        controller.record_rate_limit()
+        for _ in range(4):
+            await controller.record_success()
+        controller.record_rate_limit()  # inside the interval: no cut, but the streak restarts
+        assert controller.cap == 5
+        for _ in range(4):
+            await controller.record_success()
+        assert controller.cap == 5
+
+    asyncio.run(main())
+
+
+def test_waiter_wakes_when_cap_grows():
+    # Real clock here: the event loop's own timers run on time.monotonic
+    async def main():
+        controller = ConcurrencyController(2, success_window=1)
+        controller.record_rate_limit()
+        assert controller.cap == 1
+
+        entered = asyncio.Event()
+
+        async def waiter():
+            async with controller:
+                entered.set()
+
+        async with controller:
+            task = asyncio.create_task(waiter())
+            await asyncio.sleep(0.01)
+            assert not entered.is_set()  # blocked at inflight == cap
+
+            # The slot stays held, only the cap growth can let the waiter in
+            await controller.record_success()
+            await asyncio.wait_for(entered.wait(), timeout=1)
+            assert controller.cap == 2
+        await task
+        assert controller.inflight == 0
+
+    asyncio.run(main())
+
+
+def test_release_lets_one_waiter_in():
+    async def main():
+        controller = ConcurrencyController(2)
+        running = peak = 0
+
+        async def job():
+            nonlocal running, peak
+            async with controller:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.005)
+                running -= 1
+
+        await asyncio.wait_for(asyncio.gather(*(job() for _ in range(20))), timeout=5)
+        assert peak == 2
+        assert controller.inflight == 0
+
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+import multiprocessing
+
+import crawler
+
+
+def test_forkserver_used_when_available(monkeypatch):
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["fork", "spawn", "forkserver"])
+    pool = crawler._make_description_pool()
+    try:
+        assert pool._mp_context.get_start_method() == "forkserver"
+    finally:
+        pool.shutdown()
+
+
+def test_platform_default_without_forkserver(monkeypatch):
+    # Windows only offers spawn, get_context("forkserver") would raise there
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+
+    real_get_context = multiprocessing.get_context
+
+    def no_forkserver(method=None):
+        assert method != "forkserver"
+        return real_get_context(method)
+
+    monkeypatch.setattr(multiprocessing, "get_context", no_forkserver)
+    pool = crawler._make_description_pool()
+    pool.shutdown()
+
+
+def test_descriptions_parsed_through_pool():
+    pool = crawler._make_description_pool()
+    try:
+        html = "<p>Hello</p><p>world</p>" * 200
+        assert pool.submit(crawler._clean_description_worker, html).result().startswith("Hello world Hello")
+    finally:
+        pool.shutdown()
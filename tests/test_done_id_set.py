@@ -0,0 +1,91 @@
+from crawler import DoneIdSet
+
+
+def test_loaded_numeric_ids_are_members():
+    done = DoneIdSet(["104871255", "1", "74897599"])
+    assert "1" in done
+    assert "104871255" in done
+    assert "74897599" in done
+    assert "2" not in done
+    assert len(done) == 3
+
+
+def test_leading_zero_ids_stay_distinct_from_canonical():
+    done = DoneIdSet(["007"])
+    assert "007" in done
+    assert "7" not in done
+
+    done = DoneIdSet(["7"])
+    assert "7" in done
+    assert "007" not in done
+
+
+def test_zero_is_numeric():
+    done = DoneIdSet(["0"])
+    assert "0" in done
+    assert "00" not in done
+
+
+def test_ids_too_long_for_int64():
+    big = "9" * 19
+    bigger = "12345678901234567890123"
+    done = DoneIdSet([big, bigger])
+    assert big in done
+    assert bigger in done
+    assert "9" * 18 not in done
+    assert len(done) == 2
+
+
+def test_non_numeric_ids():
+    done = DoneIdSet(["abc", "12a", " 12", "-5", "١٢"])
+    for pid in ("abc", "12a", " 12", "-5", "١٢"):
+        assert pid in done
+    assert "12" not in done
+    assert "5" not in done
+
+
+def test_duplicates_are_counted_once():
+    done = DoneIdSet(["5", "5", "abc", "abc", "3"])
+    assert len(done) == 3
+
+
+def test_load_spans_multiple_chunks(monkeypatch):
+    monkeypatch.setattr(DoneIdSet, "LOAD_CHUNK", 3)
+    ids = [str(n) for n in (9, 4, 7, 1, 4, 8, 2, 9)]
+    done = DoneIdSet(ids)
+    assert list(done._sorted) == [1, 2, 4, 7, 8, 9]
+    assert len(done) == 6
+
+
+def test_add_then_compact_keeps_membership():
+    done = DoneIdSet(["10", "30"])
+    done.add("20")
+    done.add("007")
+    done.add("x1")
+    assert "20" in done
+    assert len(done) == 5
+
+    done.compact()
+    assert list(done._sorted) == [10, 20, 30]
+    assert not done._recent
+    for pid in ("10", "20", "30", "007", "x1"):
+        assert pid in done
+    assert "7" not in done
+    assert len(done) == 5
+
+
+def test_add_existing_id_is_noop():
+    done = DoneIdSet(["10"])
+    done.add("10")
+    done.compact()
+    assert len(done) == 1
+
+
+def test_update_and_empty():
+    done = DoneIdSet()
+    assert len(done) == 0
+    assert "1" not in done
+    done.update(["3", "1", "3"])
+    done.compact()
+    assert list(done._sorted) == [1, 3]
+    assert len(done) == 2
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from crawler import TikiCrawler
+
+
+def _fetch(tmp_path, monkeypatch, handler, retry=2):
+    # Serve one product endpoint locally and fetch product "1" through a fresh crawler
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "logs").mkdir(exist_ok=True)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/p/{id}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        config = {
+            "api_url": f"http://127.0.0.1:{port}/p/{{id}}",
+            "concurrency": 5,
+            "timeout": 5,
+            "retry": retry,
+            "batch_size": 10,
+        }
+        (tmp_path / "settings.json").write_text(json.dumps(config))
+        crawler = TikiCrawler(tmp_path / "settings.json")
+        try:
+            async with crawler._get_session() as session:
+                return await crawler.fetch_product(session, "1"), crawler
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def _product(**fields):
+    body = {"id": 1, "name": "p", "url_key": "k", "price": 10, "description": "<p>d</p>"}
+    body.update(fields)
+
+    async def handler(request):
+        return web.json_response(body)
+
+    return handler
+
+
+def test_well_formed_images(tmp_path, monkeypatch):
+    result, _ = _fetch(tmp_path, monkeypatch, _product(images=[{"base_url": "a"}, {"base_url": "b"}]))
+    assert result == (1, "p", "k", 10, "d", ("a", "b"))
+
+
+def test_odd_image_entries_are_skipped(tmp_path, monkeypatch):
+    result, _ = _fetch(tmp_path, monkeypatch, _product(images=[None, "u", {"base_url": "a"}]))
+    assert result[5] == ("a",)
+
+
+def test_non_list_images_are_treated_as_empty(tmp_path, monkeypatch):
+    for images in ("abc", {"base_url": "a"}, 5, None):
+        result, _ = _fetch(tmp_path, monkeypatch, _product(images=images))
+        assert result[5] == ()
+
+
+def test_non_string_description_is_empty(tmp_path, monkeypatch):
+    for description in (123, ["<p>x</p>"], {"a": 1}):
+        result, crawler = _fetch(tmp_path, monkeypatch, _product(description=description))
+        assert result[4] == ""
+        assert crawler.error_count["parse_error"] == 0
+
+
+def test_parse_failure_is_counted_not_raised(tmp_path, monkeypatch):
+    async def broken_parse(self, data):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(TikiCrawler, "_parse_product", broken_parse)
+    result, crawler = _fetch(tmp_path, monkeypatch, _product())
+    assert result is None
+    assert crawler.error_count["parse_error"] == 1
@@ -0,0 +1,25 @@
+from crawler import _iter_batches
+
+
+def test_batches_follow_input_order(tmp_path):
+    path = tmp_path / "ids.csv"
+    path.write_text("id\n1\n2\n3\n4\n5\n")
+    assert list(_iter_batches(path, 2)) == [["1", "2"], ["3", "4"], ["5"]]
+
+
+def test_blank_lines_are_skipped(tmp_path):
+    path = tmp_path / "ids.csv"
+    path.write_text("id\n1\n\n2\n3\n\n")
+    assert list(_iter_batches(path, 2)) == [["1", "2"], ["3"]]
+
+
+def test_id_column_found_by_name(tmp_path):
+    path = tmp_path / "ids.csv"
+    path.write_text("name,id\na,1\nb,2\n")
+    assert list(_iter_batches(path, 10)) == [["1", "2"]]
+
+
+def test_empty_file_yields_nothing(tmp_path):
+    path = tmp_path / "ids.csv"
+    path.write_text("")
+    assert list(_iter_batches(path, 2)) == []
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import crawler
+from crawler import RateLimiter
+
+# With the jitter pinned to 1.0, attempt 1 backs off exactly 0.5 * 2 ** 1 seconds
+FALLBACK = 1.0
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(crawler.random, "uniform", lambda a, b: 1.0)
+
+
+def _http_date(delta: timedelta) -> str:
+    return format_datetime(datetime.now(timezone.utc) + delta, usegmt=True)
+
+
+def test_seconds_form_is_honored():
+    assert RateLimiter().get_delay(1, "5") == 5.0
+    assert RateLimiter().get_delay(1, "0.25") == 0.25
+
+
+@pytest.mark.parametrize("value", ["nan", "NaN", "inf", "-inf", "1e400"])
+def test_non_finite_values_fall_back_to_backoff(value):
+    assert RateLimiter().get_delay(1, value) == FALLBACK
+
+
+def test_negative_seconds_mean_retry_now():
+    assert RateLimiter().get_delay(1, "-3") == 0.0
+
+
+def test_future_http_date():
+    delay = RateLimiter().get_delay(1, _http_date(timedelta(seconds=30)))
+    assert 28 <= delay <= 30
+
+
+def test_past_http_date_means_retry_now():
+    assert RateLimiter().get_delay(1, _http_date(timedelta(hours=-1))) == 0.0
+
+
+@pytest.mark.parametrize("value", ["garbage", "soon", "", None, "Mon, 99 Foo 2024"])
+def test_garbage_falls_back_to_backoff(value):
+    assert RateLimiter().get_delay(1, value) == FALLBACK
+
+
+def test_delay_capped_at_60s():
+    limiter = RateLimiter()
+    assert limiter.get_delay(1, "1000") == 60
+    assert limiter.get_delay(1, _http_date(timedelta(hours=1))) == 60
+    assert limiter.get_delay(20) == 60